@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Calculador ROIC - Descarga de estados financieros y cálculo del ROIC
+"""
+
+import functools
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import numpy as np
+import streamlit as st
+
+# 1. Caché en disco: sobrevive a reinicios de Streamlit. Los estados financieros
+# cambian cada trimestre, así que una semana de validez es segura.
+CACHE_DIR = Path(".cache")
+CACHE_TTL = 7 * 24 * 60 * 60
+
+def file_cache(ttl=CACHE_TTL):
+    """Guarda en `.cache/{ticker}_{estado}.parquet` el resultado de la función decorada."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(ticker, statement):
+            safe_symbol = re.sub(r"[^\w.\-^=]", "_", ticker.ticker)
+            path = CACHE_DIR / f"{safe_symbol}_{statement}.parquet"
+            try:
+                if time.time() - path.stat().st_mtime < ttl:
+                    return pd.read_parquet(path).T
+            except Exception:
+                pass  # Sin caché o fichero ilegible: se descarga de nuevo
+
+            data = func(ticker, statement)
+            if not data.empty:
+                try:
+                    CACHE_DIR.mkdir(exist_ok=True)
+                    # Parquet exige nombres de columna de texto: las fechas se guardan como índice
+                    data.T.to_parquet(path)
+                except Exception:
+                    pass
+            return data
+        return wrapper
+    return decorator
+
+# 2. Descarga de estados financieros
+@file_cache()
+def fetch_statement(ticker, statement):
+    return getattr(ticker, statement)
+
+def _load_statements(ticker):
+    """Descarga la cuenta de resultados y el balance de un ticker."""
+    try:
+        return fetch_statement(ticker, "income_stmt"), fetch_statement(ticker, "balance_sheet")
+    except Exception:
+        return pd.DataFrame(), pd.DataFrame()
+
+@st.cache_data
+def fetch_all_statements(symbols):
+    """Descarga los estados financieros de todos los tickers con una sola sesión de yfinance."""
+    if not symbols:
+        return {}
+    import yfinance as yf  # Solo se carga cuando hay que descargar datos
+
+    tickers = yf.Tickers(" ".join(symbols))
+    # Las descargas siguen en paralelo: el coste está en la latencia de red, no en el cálculo
+    with ThreadPoolExecutor(max_workers=min(16, len(symbols))) as executor:
+        statements = executor.map(_load_statements, (tickers.tickers[symbol] for symbol in symbols))
+        return dict(zip(symbols, statements))
+
+# 3. Cálculo del ROIC
+# Filas de yfinance que contienen cada concepto, por orden de preferencia
+FIELD_CANDIDATES = {
+    'ebit': ['EBIT', 'Operating Income'],
+    'tax_rate': ['Tax Rate For Calcs'],
+    'pretax_income': ['Pretax Income'],
+    'tax_provision': ['Tax Provision'],
+    'equity': ['Stockholders Equity', 'Total Equity Gross Minority Interest'],
+    'total_debt': ['Total Debt'],
+    'current_debt': ['Current Debt And Capital Lease Obligation'],
+    'long_term_debt': ['Long Term Debt And Capital Lease Obligation'],
+    'cash': ['Cash And Cash Equivalents', 'Cash Cash Equivalents And Short Term Investments'],
+}
+
+def first_available(df, names, default=0):
+    """Por fecha, el primer valor no nulo entre las filas `names`.
+
+    `default` solo se usa si no existe ninguna de las filas; una celda vacía en una
+    fila existente se queda en NaN para que ese año no tenga ROIC.
+    """
+    rows = df.reindex(names).astype('float64')
+    if df.index.intersection(names).empty:
+        return rows.iloc[0].fillna(default)
+    return rows.bfill().iloc[0]
+
+def calculate_roic_for_ticker(ticker_symbol, income_stmt, balance_sheet, num_years=5):
+    """Serie de ROIC por año fiscal, con el ticker como nombre."""
+    empty = pd.Series(name=ticker_symbol, dtype='float64')
+    try:
+        if income_stmt.empty or balance_sheet.empty:
+            return empty
+
+        # Alineación por fechas comunes para evitar desajustes entre estados financieros
+        # (intersect1d devuelve las fechas ordenadas de más antigua a más reciente; se invierten
+        # antes de recortar para que num_years=0 no devuelva todas)
+        common_dates = np.intersect1d(income_stmt.columns.values, balance_sheet.columns.values)
+        common_dates = common_dates[::-1][:num_years]
+        income_stmt = income_stmt[common_dates]
+        balance_sheet = balance_sheet[common_dates]
+
+        # --- Extracción de datos: una Serie por concepto, indexada por fecha ---
+        ebit = first_available(income_stmt, FIELD_CANDIDATES['ebit'])
+
+        # Tasa impositiva con respaldo
+        pretax_inc = first_available(income_stmt, FIELD_CANDIDATES['pretax_income'], default=np.nan)
+        tax_prov = first_available(income_stmt, FIELD_CANDIDATES['tax_provision'])
+        fallback_tax_rate = (tax_prov / pretax_inc).where(pretax_inc > 0, 0.21)
+        tax_rate = first_available(income_stmt, FIELD_CANDIDATES['tax_rate'], default=np.nan).fillna(fallback_tax_rate)
+
+        # Capital Invertido (Equity + Debt - Cash)
+        equity = first_available(balance_sheet, FIELD_CANDIDATES['equity'])
+        # Sin fila 'Total Debt' se suma deuda corriente y a largo plazo; una celda vacía
+        # en cualquiera de ellas deja la deuda (y el ROIC de ese año) en NaN, no en 0
+        debt_components = (first_available(balance_sheet, FIELD_CANDIDATES['current_debt']) +
+                           first_available(balance_sheet, FIELD_CANDIDATES['long_term_debt']))
+        total_debt = first_available(balance_sheet, FIELD_CANDIDATES['total_debt'], default=debt_components)
+        cash = first_available(balance_sheet, FIELD_CANDIDATES['cash'])
+
+        nopat = (ebit * (1 - tax_rate)).to_numpy()
+        invested_capital = (equity + total_debt - cash).to_numpy()
+
+        # Sin capital invertido positivo no hay ROIC: el resultado parte de NaN y solo
+        # se divide en los años con capital positivo (sin divisiones entre cero)
+        years = pd.DatetimeIndex(common_dates).year.to_numpy(dtype=np.int32)
+        roic = np.full(len(years), np.nan, dtype=np.float64)
+        np.divide(nopat, invested_capital, out=roic, where=invested_capital > 0)
+        roic = pd.Series(roic, index=years, name=ticker_symbol)
+        # Dos cierres fiscales en el mismo año: se conserva el más reciente
+        return roic[~roic.index.duplicated()]
+    except Exception:
+        return empty
+
+# 4. Ensamblado de resultados
+@st.cache_data
+def build_roic_dataframe(tickers):
+    """Tabla de ROIC con un ticker por fila y un año por columna (de más reciente a más antiguo)."""
+    statements = fetch_all_statements(tickers)
+    all_results = [
+        calculate_roic_for_ticker(symbol, income_stmt, balance_sheet)
+        for symbol, (income_stmt, balance_sheet) in statements.items()
+    ]
+    if not all_results:
+        return pd.DataFrame()
+
+    # Crear DataFrame (una fila por Serie) y estandarizar columnas (años como enteros)
+    roic_df = pd.concat(all_results, axis=1).T
+    # Se muestran con dos decimales: float32 basta y reduce a la mitad los datos a recorrer
+    roic_df = roic_df.astype('float32')
+    roic_df.columns = [int(col) for col in roic_df.columns if str(col).isdigit()]
+
+    # Ordenar columnas de más reciente a más antigua
+    return roic_df.sort_index(axis=1, ascending=False)
+
+@st.cache_data
+def to_csv_bytes(df):
+    return df.to_csv().encode('utf-8')